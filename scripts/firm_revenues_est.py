@@ -24,14 +24,103 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-class MarketSizeEstimator:
+class RunningStats:
+    """Streaming mean/variance (Welford) plus a log-binned quantile sketch.
+
+    Memory and update cost are fixed regardless of how many values are added,
+    so a percentile rank can be read without re-scanning company_data.
+    """
+    BIN_WIDTH = 0.05   # width of each bin on the log1p scale (~5% relative error)
+    N_BINS = 512       # log1p(1e11) / BIN_WIDTH fits comfortably
+
     def __init__(self):
+        self.n = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self._counts = np.zeros(self.N_BINS, dtype=np.int64)
+        self._cdf = None
+
+    def _bin(self, values):
+        values = np.log1p(np.clip(np.nan_to_num(np.asarray(values, dtype=float)), 0, None))
+        return np.minimum((values / self.BIN_WIDTH).astype(np.int64), self.N_BINS - 1)
+
+    def add(self, value: float):
+        """Fold a single observation into the running statistics"""
+        if value is None or pd.isna(value):
+            return
+        value = float(value)
+        self.n += 1
+        delta = value - self.mean
+        self.mean += delta / self.n
+        self._m2 += delta * (value - self.mean)
+        self._counts[self._bin(value)] += 1
+        self._cdf = None
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self._m2 / (self.n - 1))) if self.n > 1 else 0.0
+
+    def percentile_rank(self, values):
+        """Approximate share of observations below each value (mid-bin ranking)"""
+        if self._cdf is None:
+            cumulative = np.cumsum(self._counts)
+            self._cdf = (cumulative - self._counts / 2) / max(self.n, 1)
+        return self._cdf[self._bin(values)]
+
+    def quantile(self, q: float) -> float:
+        """Approximate value at quantile q, read back from the sketch"""
+        if not self.n:
+            return 0.0
+        idx = int(np.searchsorted(np.cumsum(self._counts), q * self.n))
+        return float(np.expm1((min(idx, self.N_BINS - 1) + 0.5) * self.BIN_WIDTH))
+
+
+class SectorStats:
+    """Running distributions of the weighting indicators for one sector"""
+    INDICATORS = {'employees': 'employees', 'capex': 'capex', 'age': 'years_established'}
+
+    def __init__(self):
+        self.count = 0
+        self.indicators = {factor: RunningStats() for factor in self.INDICATORS}
+
+    def add(self, company: Dict):
+        self.count += 1
+        for factor, column in self.INDICATORS.items():
+            self.indicators[factor].add(company.get(column))
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame({
+            factor: {
+                'mean': s.mean, 'std': s.std, 'p25': s.quantile(0.25),
+                'median': s.quantile(0.5), 'p75': s.quantile(0.75)
+            }
+            for factor, s in self.indicators.items()
+        }).T
+
+
+class MarketSizeEstimator:
+    # Sectors with fewer companies than this fall back to fixed normalization
+    MIN_SECTOR_SAMPLES = 5
+    # Fixed-mode reference size and cap per factor
+    FIXED_SCALES = {'employees': (100, 3), 'capex': (1e6, 2), 'age': (10, 1.5)}
+    FACTOR_WEIGHTS = {'employees': 0.5, 'capex': 0.3, 'age': 0.2}
+
+    def __init__(self, normalization: str = 'fixed'):
         self.market_data = {}
+        self.sector_stats = {}
+        self.normalization = normalization
         self.company_data = pd.DataFrame(columns=[
             'name', 'sector', 'employees', 'years_established', 
             'capex', 'revenue', 'revenue_source', 'confidence'
         ])
     
+    def add_company(self, company: Dict):
+        """Append a company and fold its indicators into the sector statistics"""
+        index = len(self.company_data)
+        for col, value in company.items():
+            self.company_data.loc[index, col] = value
+        self.sector_stats.setdefault(company['sector'], SectorStats()).add(company)
+    
     def add_market_data(self, sector: str, total_market_size: float, 
                        known_companies: Dict[str, float]):
         """Register market size data for a sector"""
@@ -52,7 +141,8 @@ class MarketSizeEstimator:
         }
     
     def estimate_company_revenue(self, company_name: str, 
-                               indicators: Dict[str, float]):
+                               indicators: Dict[str, float],
+                               weights: Dict = None):
         """Estimate revenue for a company within the Z segment"""
         sector = self.company_data.loc[
             self.company_data['name'] == company_name, 'sector'].iloc[0]
@@ -70,8 +160,9 @@ class MarketSizeEstimator:
                 'confidence': 'high'
             }
         
-        # Calculate weight based on indicators
-        weights = self._calculate_weights(indicators)
+        # Calculate weight based on indicators (unless precomputed in batch)
+        if weights is None:
+            weights = self._calculate_weights(indicators, sector)
         estimated_revenue = md['avg_small_player_revenue'] * weights['total']
         
         # Quality check - shouldn't exceed remaining Z
@@ -93,25 +184,75 @@ class MarketSizeEstimator:
             'weights': weights
         }
     
-    def _calculate_weights(self, indicators: Dict[str, float]):
+    def _sector_stats_for(self, sector: str):
+        """Sector statistics to normalize against, or None for fixed constants"""
+        if self.normalization != 'sector':
+            return None
+        stats = self.sector_stats.get(sector)
+        if stats is None or stats.count < self.MIN_SECTOR_SAMPLES:
+            return None
+        return stats
+    
+    def _normalize(self, factor: str, values, stats):
+        """Scale an indicator (scalar or array) onto the weighting range.
+
+        Fixed mode divides by a reference size and caps; sector mode maps the
+        sector percentile rank onto [0, 2] so the median firm scores 1.0.
+        """
+        if stats is None:
+            scale, cap = self.FIXED_SCALES[factor]
+            return np.minimum(values / scale, cap)
+        return 2 * stats.indicators[factor].percentile_rank(values)
+    
+    def _calculate_weights(self, indicators: Dict[str, float], sector: str = None):
         """Calculate composite weighting based on company indicators"""
-        weights = {
-            'employees': min(indicators.get('employees', 0) / 100, 3),
-            'capex': min(indicators.get('capex', 0) / 1e6, 2),
-            'age': min(indicators.get('years_established', 0) / 10, 1.5)
-        }
-        
-        if 'market_share_estimate' in indicators:
+        if pd.notna(indicators.get('market_share_estimate')):
             return {
                 'total': indicators['market_share_estimate'],
                 'primary_factor': 'market_share'
             }
         
-        total = 0.5 * weights['employees'] + 0.3 * weights['capex'] + 0.2 * weights['age']
+        stats = self._sector_stats_for(sector)
+        weights = {
+            factor: float(self._normalize(factor, indicators.get(column) or 0, stats))
+            for factor, column in SectorStats.INDICATORS.items()
+        }
+        
+        total = sum(self.FACTOR_WEIGHTS[factor] * weights[factor] for factor in weights)
         return {
             'total': max(0.1, min(total, 3)),
             'factors': weights
         }
+    
+    def calculate_weights_batch(self, companies: pd.DataFrame) -> pd.DataFrame:
+        """Vectorized _calculate_weights over a frame of companies.
+
+        Returns one row per company with the factor weights and 'total'.
+        """
+        weights = pd.DataFrame(index=companies.index)
+        values = {
+            factor: pd.to_numeric(companies[column], errors='coerce').fillna(0)
+            for factor, column in SectorStats.INDICATORS.items()
+        }
+        for factor in SectorStats.INDICATORS:
+            weights[factor] = self._normalize(factor, values[factor], None)
+        
+        if self.normalization == 'sector':
+            for sector, rows in companies.groupby('sector').groups.items():
+                stats = self._sector_stats_for(sector)
+                if stats is None:
+                    continue
+                for factor in SectorStats.INDICATORS:
+                    weights.loc[rows, factor] = self._normalize(
+                        factor, values[factor].loc[rows].to_numpy(), stats)
+        
+        total = sum(self.FACTOR_WEIGHTS[factor] * weights[factor] for factor in SectorStats.INDICATORS)
+        total = total.clip(0.1, 3)
+        if 'market_share_estimate' in companies:
+            share = pd.to_numeric(companies['market_share_estimate'], errors='coerce')
+            total = share.where(share.notna(), total)
+        weights['total'] = total
+        return weights
 
 # Initialize estimator in session state
 if 'estimator' not in st.session_state:
@@ -156,6 +297,23 @@ with st.sidebar:
                 known_companies=known_companies
             )
             st.success(f"Market data saved for {sector} sector")
+    
+    st.header("Weight Normalization")
+    normalization = st.radio(
+        "Normalize indicators using",
+        ["fixed", "sector"],
+        format_func=lambda mode: {
+            'fixed': "Fixed reference sizes",
+            'sector': "Sector distributions"
+        }[mode],
+        index=["fixed", "sector"].index(st.session_state.estimator.normalization)
+    )
+    st.session_state.estimator.normalization = normalization
+    if normalization == 'sector':
+        st.caption(
+            f"Sectors with fewer than {MarketSizeEstimator.MIN_SECTOR_SAMPLES} "
+            "companies use the fixed reference sizes."
+        )
 
 # Main content area
 tab1, tab2, tab3 = st.tabs(["Add Companies", "Run Estimates", "Market Analysis"])
@@ -193,10 +351,7 @@ with tab1:
                 'confidence': None
             }
             
-            # Add to DataFrame
-            index = len(st.session_state.estimator.company_data)
-            for col, value in new_company.items():
-                st.session_state.estimator.company_data.loc[index, col] = value
+            st.session_state.estimator.add_company(new_company)
             
             st.success(f"Added {name} to dataset")
 
@@ -216,6 +371,8 @@ with tab2:
             if st.button("Run All Estimates"):
                 progress_bar = st.progress(0)
                 results = []
+                batch_weights = st.session_state.estimator.calculate_weights_batch(
+                    companies_to_estimate)
                 
                 for i, row in companies_to_estimate.iterrows():
                     try:
@@ -228,7 +385,11 @@ with tab2:
                         
                         result = st.session_state.estimator.estimate_company_revenue(
                             company_name=row['name'],
-                            indicators=indicators
+                            indicators=indicators,
+                            weights={
+                                'total': batch_weights.at[i, 'total'],
+                                'factors': batch_weights.loc[i].drop('total').to_dict()
+                            }
                         )
                         
                         # Update company data
@@ -304,6 +465,12 @@ with tab3:
                                               columns=['Revenue']).sort_values('Revenue', ascending=False)
         known_players['Revenue (USD M)'] = known_players['Revenue'] / 1e6
         st.dataframe(known_players[['Revenue (USD M)']].style.format({'Revenue (USD M)': "{:.1f}"}))
+        
+        # Indicator distributions used by sector normalization
+        if selected_sector in st.session_state.estimator.sector_stats:
+            stats = st.session_state.estimator.sector_stats[selected_sector]
+            st.subheader(f"Indicator Distributions ({stats.count} companies)")
+            st.dataframe(stats.summary().style.format("{:,.1f}"))
     else:
         st.warning("No market data configured yet. Add market data in the sidebar.")
 